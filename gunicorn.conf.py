@@ -0,0 +1,9 @@
+# Production server config: gunicorn -c gunicorn.conf.py server:app
+# 4 processes x 8 threads; each worker's DB pool (10 + 20 overflow) covers
+# its threads comfortably. Only the worker that wins the scheduler file
+# lock (see server.py) runs APScheduler and the reminder sweep.
+bind = "0.0.0.0:8080"
+workers = 4
+worker_class = "gthread"
+threads = 8
+keepalive = 5
@@ -1,13 +1,16 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, abort
 from flask_sqlalchemy import SQLAlchemy
-from flask_cors import CORS
 from flask_mail import Mail, Message
 from flask_apscheduler import APScheduler
-from datetime import datetime, timedelta, UTC, timezone
-from apscheduler.jobstores.base import JobLookupError
+from datetime import datetime, UTC
 from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from sqlalchemy import select, delete, bindparam
 from sqlalchemy.dialects.postgresql import UUID
-import uuid
+from concurrent.futures import ThreadPoolExecutor
+from uuid6 import uuid7
+import os
+import tempfile
+import orjson
 import config
 
 app = Flask(__name__)
@@ -15,6 +18,7 @@ app = Flask(__name__)
 # Configuration
 app.config['SQLALCHEMY_DATABASE_URI'] = config.SQLALCHEMY_DATABASE_URI
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = config.SQLALCHEMY_TRACK_MODIFICATIONS
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = config.SQLALCHEMY_ENGINE_OPTIONS
 app.config['MAIL_SERVER'] = config.MAIL_SERVER
 app.config['MAIL_PORT'] = config.MAIL_PORT
 app.config['MAIL_USE_TLS'] = config.MAIL_USE_TLS
@@ -27,20 +31,66 @@ db = SQLAlchemy(app)
 mail = Mail(app)
 
 
-app.config['SCHEDULER_JOBSTORES'] = {
-    'default': SQLAlchemyJobStore(url=app.config['SQLALCHEMY_DATABASE_URI'])
-}
+# Share the pooled engine with the jobstore instead of letting it open
+# its own connections.
+with app.app_context():
+    app.config['SCHEDULER_JOBSTORES'] = {
+        'default': SQLAlchemyJobStore(engine=db.engine)
+    }
 app.config['SCHEDULER_API_ENABLED'] = True
 scheduler = APScheduler()
 scheduler.init_app(app)
-scheduler.start()
 
-# Enable CORS
-CORS(app)
+def _acquire_scheduler_lock():
+    """Elect exactly one process on this host to run the scheduler.
+
+    gunicorn forks several workers that each import this module, but
+    APScheduler does not coordinate schedulers sharing a jobstore — every
+    worker would run the sweep and send duplicate emails. The first
+    process to grab an exclusive lock on a temp file wins; the lock is
+    held (via the leaked file handle) for the life of the process.
+    """
+    global _scheduler_lock_file
+    _scheduler_lock_file = open(
+        os.path.join(tempfile.gettempdir(), 'levonoteserver-scheduler.lock'), 'w')
+    try:
+        import fcntl
+        fcntl.flock(_scheduler_lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except ImportError:
+        # No fcntl (Windows dev server): single process, safe to run.
+        return True
+    except OSError:
+        return False
+
+run_scheduler = _acquire_scheduler_lock()
+if run_scheduler:
+    scheduler.start()
+
+# Enable CORS. The API accepts any origin, so static headers cost less
+# per request than flask-cors's origin matching.
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type',
+    'Access-Control-Max-Age': '3600',
+}
+
+@app.before_request
+def handle_preflight():
+    if request.method == 'OPTIONS':
+        return Response(status=204, headers=CORS_HEADERS)
+
+@app.after_request
+def add_cors_headers(response):
+    response.headers.update(CORS_HEADERS)
+    return response
 
 # Models
 class Note(db.Model):
-    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # uuid7 is time-ordered, so new rows append to the PK BTree instead of
+    # fragmenting it the way random uuid4 keys do.
+    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     title = db.Column(db.String(100), nullable=False)
     content = db.Column(db.Text, nullable=False)
     is_pinned = db.Column(db.Boolean, default=False)
@@ -52,60 +102,179 @@ class Note(db.Model):
     is_archived = db.Column(db.Boolean, default=False)
     is_trashed = db.Column(db.Boolean, default=False)
 
+    # Covers the scheduler sweep's filter on has_reminder + reminder_datetime;
+    # partial on Postgres so only rows with a pending reminder are indexed.
+    __table_args__ = (
+        db.Index(
+            'ix_note_reminder_sweep', 'has_reminder', 'reminder_datetime',
+            postgresql_where=db.text('has_reminder')
+        ),
+    )
+
 # Helper Functions
-def send_reminder_email(note_id):
+
+# SMTP round-trips run on this pool so neither the APScheduler thread nor
+# a request thread blocks on mail delivery.
+mail_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='reminder-mail')
+
+def _deliver_reminder(note_id, title, content, recipient):
+    """Send one reminder email; runs on the mail pool. Returns True on success."""
     with app.app_context():
-        note = Note.query.get(note_id)
-        if note and note.has_reminder and note.reminder_email:
-            try:
-                msg = Message(
-                    subject=f"Reminder: {note.title}",
-                    recipients=[note.reminder_email],
-                    body=f"{note.content}"
-                )
-                mail.send(msg)
-                app.logger.info(f"Reminder email sent for note {note.id} to {note.reminder_email}")
-                
-                # Clear the reminder after sending
-                note.has_reminder = False
-                note.reminder_datetime = None
-                db.session.commit()
-            except Exception as e:
-                app.logger.error(f"Failed to send reminder email for note {note.id}: {str(e)}")
-        else:
-            app.logger.warning(f"Attempted to send reminder for non-existent or invalid note: {note_id}")
+        try:
+            msg = Message(
+                subject=f"Reminder: {title}",
+                recipients=[recipient],
+                body=f"{content}"
+            )
+            mail.send(msg)
+            app.logger.info(f"Reminder email sent for note {note_id} to {recipient}")
+            return True
+        except Exception as e:
+            app.logger.error(f"Failed to send reminder email for note {note_id}: {str(e)}")
+            return False
+
+# All reminders are delivered by a single periodic sweep rather than one
+# persisted jobstore row per note; the sweep is an index range scan on
+# ix_note_reminder_sweep. The interval backs off exponentially while no
+# reminders are firing and snaps back to the base as soon as one does.
+SWEEP_INTERVAL_SECONDS = 30
+SWEEP_MAX_INTERVAL_SECONDS = 300
+SWEEP_BACKOFF_FACTOR = 1.5
+
+_sweep_interval = SWEEP_INTERVAL_SECONDS
+
+# Built once at import; the sweep only binds a fresh timestamp, so
+# frequent polling skips statement-construction overhead.
+MISSED_REMINDERS_STMT = select(Note).where(
+    Note.has_reminder.is_(True),
+    Note.reminder_datetime <= bindparam('now')
+)
+
+def _adapt_sweep_interval(found_reminders):
+    global _sweep_interval
+    if found_reminders:
+        new_interval = SWEEP_INTERVAL_SECONDS
+    else:
+        new_interval = min(_sweep_interval * SWEEP_BACKOFF_FACTOR, SWEEP_MAX_INTERVAL_SECONDS)
+    if new_interval != _sweep_interval:
+        # flask-apscheduler's modify_job only accepts a trigger name plus
+        # kwargs, not a trigger instance. Never let a scheduler error
+        # escape into the sweep.
+        try:
+            scheduler.modify_job('reminder_sweep', trigger='interval', seconds=new_interval)
+            _sweep_interval = new_interval
+        except Exception as e:
+            app.logger.error(f"Failed to adjust reminder sweep interval: {str(e)}")
 
 def check_missed_reminders():
     with app.app_context():
         current_time = datetime.now(UTC)
-        missed_reminders = Note.query.filter(
-            Note.has_reminder == True,
-            Note.reminder_datetime <= current_time,
-            Note.reminder_datetime > (current_time - timedelta(days=1))  # Limit to last 24 hours
-        ).all()
-        
+        # Every note still flagged and due is picked up, no matter when it
+        # was set: sent reminders are cleared by the bulk UPDATE below, so
+        # the flag itself dedups, and a failed send stays flagged and is
+        # retried on the next sweep.
+        missed_reminders = db.session.execute(
+            MISSED_REMINDERS_STMT, {'now': current_time}
+        ).scalars().all()
+
+        # Fan the sends out over the mail pool so SMTP latency overlaps,
+        # then clear everything that went through with one bulk UPDATE.
+        futures = {}
+        sent_ids = []
         for note in missed_reminders:
-            send_reminder_email(note.id)
-            app.logger.info(f"Sent missed reminder for note {note.id}")
+            if note.reminder_email:
+                futures[mail_executor.submit(
+                    _deliver_reminder, note.id, note.title, note.content, note.reminder_email
+                )] = note.id
+            else:
+                # A reminder with no address can never be delivered; clear
+                # it too, or it would match every future sweep.
+                app.logger.warning(f"Clearing undeliverable reminder without an email address on note {note.id}")
+                sent_ids.append(note.id)
 
+        for future, note_id in futures.items():
+            if future.result():
+                sent_ids.append(note_id)
+                app.logger.info(f"Sent missed reminder for note {note_id}")
 
-# Routes
-@app.route('/notes', methods=['GET'])
-def get_notes():
-    notes = Note.query.filter_by(is_archived=False, is_trashed=False).all()
-    return jsonify([{
+        if sent_ids:
+            db.session.query(Note).filter(Note.id.in_(sent_ids)).update(
+                {'has_reminder': False, 'reminder_datetime': None},
+                synchronize_session=False
+            )
+            db.session.commit()
+
+        # Adjust the interval only after the found reminders are handled.
+        _adapt_sweep_interval(bool(missed_reminders))
+
+if run_scheduler:
+    scheduler.add_job(
+        id='reminder_sweep',
+        func=check_missed_reminders,
+        trigger='interval',
+        seconds=SWEEP_INTERVAL_SECONDS,
+        replace_existing=True
+    )
+
+
+def parse_client_dt(s):
+    """Parse an ISO datetime from the client into an aware UTC datetime.
+
+    Honors any offset the client supplies (converting to UTC) instead of
+    clobbering it; naive values are assumed to already be UTC.
+    """
+    dt = datetime.fromisoformat(s.replace('Z', '+00:00'))
+    return dt.astimezone(UTC) if dt.tzinfo else dt.replace(tzinfo=UTC)
+
+
+def note_to_dict(note):
+    """Serializable dict for a Note instance or a projected row with the
+    same attributes. Datetimes and UUIDs are left raw for orjson."""
+    return {
         'id': note.id,
         'title': note.title,
         'content': note.content,
         'is_pinned': note.is_pinned,
         'has_reminder': note.has_reminder,
-        'reminder_datetime': note.reminder_datetime.isoformat() if note.reminder_datetime else None,
+        'reminder_datetime': note.reminder_datetime,
         'reminder_email': note.reminder_email,
-        'created_at': note.created_at.isoformat(),
-        'updated_at': note.updated_at.isoformat(),
+        'created_at': note.created_at,
+        'updated_at': note.updated_at,
         'is_archived': note.is_archived,
         'is_trashed': note.is_trashed
-    } for note in notes])
+    }
+
+def json_response(obj, status=200):
+    # orjson serializes datetime and UUID natively in C; OPT_NAIVE_UTC marks
+    # the naive UTC column values as +00:00.
+    return Response(orjson.dumps(obj, option=orjson.OPT_NAIVE_UTC),
+                    status=status, mimetype='application/json')
+
+def stream_json_list(rows, row_to_dict):
+    """Stream a JSON array response from a row iterator, one row at a time."""
+    def generate():
+        yield b'['
+        first = True
+        for row in rows:
+            prefix = b'' if first else b','
+            first = False
+            yield prefix + orjson.dumps(row_to_dict(row), option=orjson.OPT_NAIVE_UTC)
+        yield b']'
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+# Routes
+@app.route('/notes', methods=['GET'])
+def get_notes():
+    # Project columns explicitly so rows come back as plain tuples instead
+    # of fully-hydrated ORM instances, and stream in batches so the full
+    # result set is never resident at once.
+    stmt = select(
+        Note.id, Note.title, Note.content, Note.is_pinned, Note.has_reminder,
+        Note.reminder_datetime, Note.reminder_email, Note.created_at,
+        Note.updated_at, Note.is_archived, Note.is_trashed
+    ).where(Note.is_archived == False, Note.is_trashed == False)
+    notes = db.session.execute(stmt, execution_options={'yield_per': 500})
+    return stream_json_list(notes, note_to_dict)
 
 @app.route('/notes', methods=['POST'])
 def create_note():
@@ -115,7 +284,7 @@ def create_note():
         content=data['content'],
         is_pinned=data.get('is_pinned', False),
         has_reminder=data.get('has_reminder', False),
-        reminder_datetime=datetime.fromisoformat(data['reminder_datetime']).replace(tzinfo=UTC) if data.get('reminder_datetime') else None,
+        reminder_datetime=parse_client_dt(data['reminder_datetime']) if data.get('reminder_datetime') else None,
         reminder_email=data.get('reminder_email'),
         is_archived=data.get('is_archived', False),
         is_trashed=data.get('is_trashed', False)
@@ -123,36 +292,15 @@ def create_note():
     db.session.add(new_note)
     db.session.commit()
 
-    # If a reminder is set, schedule it
-    if new_note.has_reminder and new_note.reminder_datetime:
-        scheduler.add_job(
-            id=f'reminder_{new_note.id}',
-            func=send_reminder_email,
-            trigger='date',
-            run_date=new_note.reminder_datetime,
-            args=[new_note.id]
-        )
-
-    return jsonify({
+    # Any reminder on the note is picked up by the periodic sweep.
+    return json_response({
         'message': 'Note created successfully',
-        'note': {
-            'id': new_note.id,
-            'title': new_note.title,
-            'content': new_note.content,
-            'is_pinned': new_note.is_pinned,
-            'has_reminder': new_note.has_reminder,
-            'reminder_datetime': new_note.reminder_datetime.isoformat() if new_note.reminder_datetime else None,
-            'reminder_email': new_note.reminder_email,
-            'created_at': new_note.created_at.isoformat(),
-            'updated_at': new_note.updated_at.isoformat(),
-            'is_archived': new_note.is_archived,
-            'is_trashed': new_note.is_trashed
-        }
-    }), 201
+        'note': note_to_dict(new_note)
+    }, 201)
 
 @app.route('/notes/<uuid:note_id>', methods=['PUT'])
 def update_note(note_id):
-    note = Note.query.get_or_404(note_id)
+    note = db.session.get(Note, note_id) or abort(404)
     data = request.json
 
     note.title = data.get('title', note.title)
@@ -161,41 +309,22 @@ def update_note(note_id):
     note.is_archived = data.get('is_archived', note.is_archived)
     note.is_trashed = data.get('is_trashed', note.is_trashed)
     note.has_reminder = data.get('has_reminder', note.has_reminder)
-    note.reminder_datetime = datetime.fromisoformat(data['reminder_datetime']).replace(tzinfo=UTC) if data.get('reminder_datetime') else None,
+    note.reminder_datetime = parse_client_dt(data['reminder_datetime']) if data.get('reminder_datetime') else None
     note.reminder_email = data.get('email', note.reminder_email)
 
-    db.session.commit()
+    # Skip the flush/commit round-trip entirely for no-op updates.
+    if db.session.is_modified(note):
+        db.session.commit()
 
-    # If a reminder is set, schedule it
-    if note.has_reminder and note.reminder_datetime:
-        scheduler.add_job(
-            id=f'reminder_{note.id}',
-            func=send_reminder_email,
-            trigger='date',
-            run_date=note.reminder_datetime,
-            args=[note.id]
-        )
-
-    return jsonify({
+    # Any reminder on the note is picked up by the periodic sweep.
+    return json_response({
         'message': 'Note updated successfully',
-        'note': {
-            'id': note.id,
-            'title': note.title,
-            'content': note.content,
-            'is_pinned': note.is_pinned,
-            'has_reminder': note.has_reminder,
-            'reminder_datetime': note.reminder_datetime.isoformat() if note.reminder_datetime else None,
-            'reminder_email': note.reminder_email,
-            'created_at': note.created_at.isoformat(),
-            'updated_at': note.updated_at.isoformat(),
-            'is_archived': note.is_archived,
-            'is_trashed': note.is_trashed
-        }
+        'note': note_to_dict(note)
     })
 
 @app.route('/notes/<uuid:note_id>', methods=['DELETE'])
 def delete_note(note_id):
-    note = Note.query.get_or_404(note_id)
+    note = db.session.get(Note, note_id) or abort(404)
     note.is_archived = False
     note.is_pinned = False
     note.is_trashed = True
@@ -204,7 +333,7 @@ def delete_note(note_id):
 
 @app.route('/notes/<uuid:note_id>/archive', methods=['PUT'])
 def archive_note(note_id):
-    note = Note.query.get_or_404(note_id)
+    note = db.session.get(Note, note_id) or abort(404)
     note.is_pinned = False
     note.is_trashed = False
     note.is_archived = True
@@ -213,28 +342,37 @@ def archive_note(note_id):
 
 @app.route('/archives', methods=['GET'])
 def get_archived_notes():
-    archived_notes = Note.query.filter_by(is_archived=True, is_trashed=False).all()
-    return jsonify([{
+    stmt = select(
+        Note.id, Note.title, Note.content, Note.updated_at
+    ).where(Note.is_archived == True, Note.is_trashed == False)
+    archived_notes = db.session.execute(stmt, execution_options={'yield_per': 500})
+    return stream_json_list(archived_notes, lambda note: {
         'id': note.id,
         'title': note.title,
         'content': note.content,
         'updated_at': note.updated_at
-    } for note in archived_notes])
+    })
 
 @app.route('/trash', methods=['GET'])
 def get_trashed_notes():
-    trashed_notes = Note.query.filter_by(is_trashed=True).all()
-    return jsonify([{
+    stmt = select(
+        Note.id, Note.title, Note.content, Note.updated_at
+    ).where(Note.is_trashed == True)
+    trashed_notes = db.session.execute(stmt, execution_options={'yield_per': 500})
+    return stream_json_list(trashed_notes, lambda note: {
         'id': note.id,
         'title': note.title,
         'content': note.content,
         'updated_at': note.updated_at
-    } for note in trashed_notes])
+    })
 
 @app.route('/reminders', methods=['GET'])
 def get_reminders():
-    reminders = Note.query.filter_by(has_reminder=True, is_archived=False, is_trashed=False).all()
-    return jsonify([{
+    reminders = db.session.query(
+        Note.id, Note.title, Note.content, Note.reminder_datetime,
+        Note.reminder_email, Note.updated_at
+    ).filter_by(has_reminder=True, is_archived=False, is_trashed=False).all()
+    return json_response([{
         'id': note.id,
         'title': note.title,
         'content': note.content,
@@ -245,7 +383,7 @@ def get_reminders():
 
 @app.route('/notes/<uuid:note_id>/restore', methods=['PUT'])
 def restore_note(note_id):
-    note = Note.query.get_or_404(note_id)
+    note = db.session.get(Note, note_id) or abort(404)
     note.is_trashed = False
     note.is_archived = False
     db.session.commit()
@@ -253,30 +391,26 @@ def restore_note(note_id):
 
 @app.route('/notes/<uuid:note_id>/permanent-delete', methods=['DELETE'])
 def permanent_delete_note(note_id):
-    note = Note.query.get_or_404(note_id)
-    db.session.delete(note)
+    # Single DELETE round-trip; no need to SELECT the row first.
+    result = db.session.execute(delete(Note).where(Note.id == note_id))
     db.session.commit()
+    if result.rowcount == 0:
+        abort(404)
     return jsonify({'message': 'Note permanently deleted'})
 
 @app.route('/notes/<uuid:note_id>', methods=['GET'])
 def get_single_note(note_id):
-    note = Note.query.get_or_404(note_id)
-    return jsonify({
-        'id': note.id,
-        'title': note.title,
-        'content': note.content,
-        'is_pinned': note.is_pinned,
-        'has_reminder': note.has_reminder,
-        'reminder_datetime': note.reminder_datetime.isoformat() if note.reminder_datetime else None,
-        'reminder_email': note.reminder_email,
-        'created_at': note.created_at.isoformat(),
-        'updated_at': note.updated_at.isoformat(),
-        'is_archived': note.is_archived,
-        'is_trashed': note.is_trashed
-    })
+    note = db.session.get(Note, note_id) or abort(404)
+    return json_response(note_to_dict(note))
 
-if __name__ == '__main__':
+# Runs at import so gunicorn deployments get tables too, but only in the
+# scheduler-lock winner: create_all's checkfirst is check-then-create, so
+# concurrent workers racing it on a fresh database both issue CREATE and
+# the loser dies with DuplicateTable.
+if run_scheduler:
     with app.app_context():
         db.create_all()
-        check_missed_reminders()
+
+if __name__ == '__main__':
+    # Dev server only; production runs `gunicorn -c gunicorn.conf.py server:app`.
     app.run(debug=True, port=8080)
\ No newline at end of file